@@ -26,19 +26,21 @@ class EntityLifecycle:
             return
         
         # Simulating experience stream
-        self.memory.ram.write("last_awake_t", time.time())
         exp = self.memory.ram.read("experience_count") or 0
-        self.memory.ram.write("experience_count", exp + 1)
+        self.memory.ram.write_many({
+            "last_awake_t": time.time(),
+            "experience_count": exp + 1,
+        })
 
     def light_sleep(self):
         """RAM housekeeping + incremental writes (to Volume)."""
         logger.info("[SLEEP] Light sleep triggered.")
         self.memory.incremental_backup()
 
-    def deep_sleep(self):
-        """compaction + atomic snapshot (to Bucket)."""
+    def deep_sleep(self, tag: Optional[str] = None) -> str:
+        """compaction + atomic snapshot (to Bucket). Returns SHA256."""
         logger.info("[SLEEP] Deep sleep triggered. Consolidating state.")
-        self.memory.snapshot(tag=str(int(time.time())))
+        return self.memory.snapshot(tag=tag or str(int(time.time())))
 
     def death(self):
         """detach consciousness; RAM wiped."""
@@ -56,8 +58,7 @@ class EntityLifecycle:
             last_t = state_data.get("last_awake_t")
             logger.info(f"[RESTORE] Recovered state from Volume (last seen: {last_t})")
             # Restore relevant keys to RAM for continuity
-            for k, v in state_data.items():
-                self.memory.ram.write(k, v)
+            self.memory.ram.write_many(state_data)
         else:
             logger.info("[RESTORE] No persistent state found. Fresh start.")
         
@@ -32,10 +32,14 @@ class RAMLayer(MemoryLayer):
         self.path.write_text(json.dumps(self.data, indent=2), encoding="utf-8")
 
     def write(self, key: str, data: Any) -> Optional[str]:
-        self.data[key] = data
-        self._sync_to_disk()
+        self.write_many({key: data})
         return None
 
+    def write_many(self, items: Dict[str, Any]):
+        """Update several keys with a single sync to disk."""
+        self.data.update(items)
+        self._sync_to_disk()
+
     def read(self, key: str) -> Optional[Any]:
         return self.data.get(key)
 
@@ -54,11 +58,15 @@ class VolumeLayer(MemoryLayer):
         self.path.parent.mkdir(parents=True, exist_ok=True)
 
     def write(self, key: str, data: Any) -> Optional[str]:
+        self.write_many({key: data})
+        return None
+
+    def write_many(self, items: Dict[str, Any]):
+        """Merge several keys with a single read and rewrite of the volume file."""
         # We store everything in one persistent JSON for the volume in this stage
         current = self.load_all()
-        current[key] = data
+        current.update(items)
         self.path.write_text(json.dumps(current, indent=2), encoding="utf-8")
-        return None
 
 
     def read(self, key: str) -> Optional[Any]:
@@ -112,8 +120,7 @@ class MemoryManager:
     def incremental_backup(self):
         """RAM -> Volume"""
         logger.info("[MEMORY] RAM to Volume incremental synchronization.")
-        for key, val in self.ram.data.items():
-            self.volume.write(key, val)
+        self.volume.write_many(self.ram.data)
 
     def snapshot(self, tag: str) -> str:
         """Full state -> Bucket. Returns SHA256."""
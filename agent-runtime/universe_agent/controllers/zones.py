@@ -1,4 +1,5 @@
 import logging
+from operator import attrgetter
 from typing import List, Dict, Tuple
 from ..models import Consciousness, Relationship, ZoneWeight
 
@@ -16,6 +17,11 @@ RELATIONSHIP_BASE_WEIGHTS = {
     "acquaintance": 0.1,
 }
 
+# Relationship types routed to each non-default zone
+FAMILY_RELATIONSHIPS = frozenset(("parent-child", "spouse", "sibling"))
+WORK_RELATIONSHIPS = frozenset(("coworker-team", "manager-report"))
+FRIEND_RELATIONSHIPS = frozenset(("close-friend", "friend"))
+
 class ZoneController:
     """
     Implements Social-Graph Sharding and Weighted Membership.
@@ -42,11 +48,11 @@ class ZoneController:
 
     def map_relationship_to_zone(self, rel_type: str) -> str:
         """Simple mapping for MVP."""
-        if rel_type in ["parent-child", "spouse", "sibling"]:
+        if rel_type in FAMILY_RELATIONSHIPS:
             return "family"
-        if rel_type in ["coworker-team", "manager-report"]:
+        if rel_type in WORK_RELATIONSHIPS:
             return "work"
-        if rel_type in ["close-friend", "friend"]:
+        if rel_type in FRIEND_RELATIONSHIPS:
             return "friends"
         return "community"
 
@@ -75,7 +81,7 @@ class ZoneController:
                 memberships.append(ZoneWeight(zone_id=zone, weight=round(weight, 4)))
         
         # Sort by weight descending and keep top K (K=3)
-        memberships.sort(key=lambda x: x.weight, reverse=True)
+        memberships.sort(key=attrgetter("weight"), reverse=True)
         top_memberships = memberships[:3]
         
         # Re-normalize if we truncated
@@ -0,0 +1,149 @@
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .workspace import Workspace
+
+logger = logging.getLogger(__name__)
+
+INBOX_ROUTE = "/inbox"
+INBOX_FILE = "inbox.jsonl"
+# Largest inbox entry accepted, in bytes.
+MAX_ENTRY_BYTES = 1 << 20
+
+class _Batch:
+    def __init__(self):
+        self.lines = []
+        self.done = threading.Event()
+        self.error = None
+
+class InboxWriter:
+    """
+    Appends inbox lines to the workspace inbox with group commit: append()
+    returns only once its line has been written to the file, and every line
+    that arrives while a write is in progress goes out together in the next
+    one. A burst of deliveries then costs one open/write on the PVC per batch
+    instead of one per task.
+
+    Lines are acknowledged once they are in the kernel's page cache, which
+    survives a runtime or container crash; like the exec path, there is no
+    fsync, so acknowledgement latency does not depend on the volume's sync
+    cost.
+    """
+    def __init__(self, workspace: Workspace):
+        self.path = workspace.path(INBOX_FILE)
+        self._batch = _Batch()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="inbox-flusher", daemon=True)
+        self._thread.start()
+
+    def append(self, entry: dict):
+        """Writes entry as one inbox line. Raises OSError if the write failed."""
+        line = json.dumps(entry) + "\n"
+        with self._cond:
+            if self._closed:
+                raise OSError("inbox writer is closed")
+            batch = self._batch
+            batch.lines.append(line)
+            self._cond.notify()
+        batch.done.wait()
+        if batch.error is not None:
+            raise batch.error
+
+    def close(self):
+        """Writes out anything still pending and stops the flusher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _write(self, lines):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._batch.lines and not self._closed:
+                    self._cond.wait()
+                batch, self._batch = self._batch, _Batch()
+                closing = self._closed
+            if batch.lines:
+                try:
+                    self._write(batch.lines)
+                except Exception as e:
+                    # Fail this batch only; the waiting posts answer 5xx and
+                    # the next batch tries again.
+                    logger.error("Failed to write %d inbox lines: %s", len(batch.lines), e)
+                    batch.error = e if isinstance(e, OSError) else OSError(str(e))
+                batch.done.set()
+            if closing:
+                return
+
+class _InboxHTTPServer(ThreadingHTTPServer):
+    # Posts are held until their batch is written; let bursts queue instead
+    # of overflowing the default listen backlog of 5.
+    request_queue_size = 64
+
+def start_inbox_server(workspace: Workspace, port: int, token: str) -> ThreadingHTTPServer:
+    """
+    Serves POST /inbox so the operator can deliver tasks over plain HTTP
+    instead of exec'ing into the pod. Each JSON object posted is appended
+    as one line to the workspace inbox, which the main loop already tails.
+    Posts must carry "Authorization: Bearer <token>".
+    """
+    writer = InboxWriter(workspace)
+    expected_auth = f"Bearer {token}".encode("utf-8")
+
+    class InboxHandler(BaseHTTPRequestHandler):
+        # Keep the operator's pooled connection open between deliveries;
+        # every response carries a length or no body. send_error() still
+        # closes the connection, so an unread body is never misparsed.
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            if self.path != INBOX_ROUTE:
+                self.send_error(404)
+                return
+            auth = (self.headers.get("Authorization") or "").encode("utf-8")
+            if not hmac.compare_digest(auth, expected_auth):
+                self.send_error(401)
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                self.send_error(400, "invalid Content-Length")
+                return
+            if length < 0:
+                self.send_error(400, "invalid Content-Length")
+                return
+            if length > MAX_ENTRY_BYTES:
+                self.send_error(413)
+                return
+            try:
+                entry = json.loads(self.rfile.read(length))
+            except ValueError:
+                self.send_error(400, "body is not valid JSON")
+                return
+            if not isinstance(entry, dict):
+                self.send_error(400, "body must be a JSON object")
+                return
+
+            try:
+                writer.append(entry)
+            except OSError:
+                self.send_error(503, "inbox write failed")
+                return
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = _InboxHTTPServer(("", port), InboxHandler)
+    server.inbox_writer = writer
+    threading.Thread(target=server.serve_forever, name="inbox-server", daemon=True).start()
+    return server
@@ -7,6 +7,7 @@ from .tools.registry import ToolRegistry
 from .tools.runner import ToolRunner
 from .models import Consciousness
 from .tools.audit import write_audit
+from .inbox_server import start_inbox_server, INBOX_FILE
 from .controllers import (
     EntityLifecycle, 
     ZoneController, 
@@ -84,8 +85,17 @@ def main():
 
     print(f"[BOOT] agent={agent_name} consciousness={consciousness.id} run_id={run_id}")
 
-    inbox = workspace.path("inbox.jsonl")
+    inbox = workspace.path(INBOX_FILE)
     cursor = 0
+    # The operator re-delivers a task when it could not confirm the first
+    # delivery, so the same task_id can appear more than once.
+    seen_tasks = set()
+    inbox_server = None
+    inbox_token = os.getenv("INBOX_TOKEN")
+    if inbox_token:
+        inbox_server = start_inbox_server(workspace, int(os.getenv("INBOX_PORT", "8081")), inbox_token)
+    else:
+        print("[BOOT] INBOX_TOKEN not set, inbox endpoint disabled")
 
     try:
         while True:
@@ -113,11 +123,12 @@ def main():
             recommendation = sleep_ctrl.get_sleep_recommendation(consciousness, ram_keys)
             
             if recommendation == "DEEP":
-                sha256 = lifecycle.deep_sleep()
+                snap_tag = str(int(time.time()))
+                sha256 = lifecycle.deep_sleep(tag=snap_tag)
                 sleep_ctrl.record_deep_sleep()
                 audit("DEEP_SLEEP", {
                     "trigger": "Frag>T2",
-                    "snapshot_path": f"/workspace/state/bucket/snap-{int(time.time())}.json",
+                    "snapshot_path": f"/workspace/state/bucket/snap-{snap_tag}.json",
                     "snapshot_sha256": sha256,
                     "backup_outcome": "SUCCESS"
                 })
@@ -126,18 +137,32 @@ def main():
                 audit("LIGHT_SLEEP", {"trigger": "Frag>T1", "ram_to_volume_written": True})
             
             if inbox.exists():
-                lines = inbox.read_text(encoding="utf-8").splitlines()
-                new = lines[cursor:]
-                cursor = len(lines)
-                for line in new:
+                # cursor is a byte offset: only read what was appended since
+                # the last tick, and leave a trailing partial line for later.
+                with inbox.open("rb") as f:
+                    if os.fstat(f.fileno()).st_size < cursor:
+                        cursor = 0  # inbox was truncated or replaced
+                    f.seek(cursor)
+                    chunk = f.read()
+                end = chunk.rfind(b"\n") + 1
+                cursor += end
+                for line in chunk[:end].decode("utf-8").splitlines():
                     if not line.strip():
                         continue
                     msg = json.loads(line)
+                    task_id = msg.get("task_id")
+                    if task_id is not None:
+                        if task_id in seen_tasks:
+                            continue
+                        seen_tasks.add(task_id)
                     text = msg.get("text","")
                     print(f"[INBOX] {text!r}")
 
             time.sleep(0.5)
     except KeyboardInterrupt:
+        if inbox_server is not None:
+            inbox_server.shutdown()
+            inbox_server.inbox_writer.close()
         audit("DEATH", {"reason": "termination", "ram_wiped": True})
         lifecycle.death()
         print("[SHUTDOWN] ram wiped.")
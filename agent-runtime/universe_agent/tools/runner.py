@@ -13,6 +13,12 @@ class ToolRunner:
         self.agent_name = agent_name
         self.namespace = namespace
         self.sandbox = SandboxK8s(namespace)
+        self._handlers = {
+            "fs.read": self._fs_read,
+            "fs.write": self._fs_write,
+            "http.fetch": self._http_fetch,
+            "sandbox.shell": self._sandbox_shell,
+        }
 
     def run(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
         fn = tool_call.get("function", {})
@@ -36,58 +42,47 @@ class ToolRunner:
             })
             raise
 
-        if name == "fs.read":
-            p = self.workspace.path(args["path"])
-            out = p.read_text(encoding="utf-8") if p.exists() else ""
-            write_audit(self.workspace, {
-                "t": time.time(),
-                "agent": self.agent_name,
-                "ns": self.namespace,
-                "tool": name,
-                "allowed": True,
-                "args_sha256": args_hash,
-            })
-            return {"tool": name, "ok": True, "content": out}
+        handler = self._handlers.get(name)
+        if handler is None:
+            return {"tool": name, "ok": False, "error": "unknown tool"}
+        return handler(name, args, args_hash)
 
-        if name == "fs.write":
-            p = self.workspace.path(args["path"])
-            p.parent.mkdir(parents=True, exist_ok=True)
-            p.write_text(args["content"], encoding="utf-8")
-            write_audit(self.workspace, {
-                "t": time.time(),
-                "agent": self.agent_name,
-                "ns": self.namespace,
-                "tool": name,
-                "allowed": True,
-                "args_sha256": args_hash,
-            })
-            return {"tool": name, "ok": True}
+    def _audit_allowed(self, name: str, args_hash: str, **extra: Any):
+        write_audit(self.workspace, {
+            "t": time.time(),
+            "agent": self.agent_name,
+            "ns": self.namespace,
+            "tool": name,
+            "allowed": True,
+            "args_sha256": args_hash,
+            **extra,
+        })
 
-        if name == "http.fetch":
-            # Stub for audit
-            write_audit(self.workspace, {
-                "t": time.time(),
-                "agent": self.agent_name,
-                "ns": self.namespace,
-                "tool": name,
-                "allowed": True,
-                "args_sha256": args_hash,
-            })
-            return {"tool": name, "ok": True, "note": "stubbed in MVP"}
+    def _fs_read(self, name: str, args: Dict[str, Any], args_hash: str) -> Dict[str, Any]:
+        p = self.workspace.path(args["path"])
+        out = p.read_text(encoding="utf-8") if p.exists() else ""
+        self._audit_allowed(name, args_hash)
+        return {"tool": name, "ok": True, "content": out}
 
-        if name == "sandbox.shell":
-            job_name, out = self.sandbox.run_shell(args["cmd"])
-            write_audit(self.workspace, {
-                "t": time.time(),
-                "agent": self.agent_name,
-                "ns": self.namespace,
-                "tool": name,
-                "allowed": True,
-                "args_sha256": args_hash,
-                "sandbox_job": job_name,
-                "stdout_sha256": sha256_text(out),
-                "stdout_preview": out[:200],
-            })
-            return {"tool": name, "ok": True, "stdout": out, "job": job_name}
+    def _fs_write(self, name: str, args: Dict[str, Any], args_hash: str) -> Dict[str, Any]:
+        p = self.workspace.path(args["path"])
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(args["content"], encoding="utf-8")
+        self._audit_allowed(name, args_hash)
+        return {"tool": name, "ok": True}
+
+    def _http_fetch(self, name: str, args: Dict[str, Any], args_hash: str) -> Dict[str, Any]:
+        # Stub for audit
+        self._audit_allowed(name, args_hash)
+        return {"tool": name, "ok": True, "note": "stubbed in MVP"}
 
-        return {"tool": name, "ok": False, "error": "unknown tool"}
+    def _sandbox_shell(self, name: str, args: Dict[str, Any], args_hash: str) -> Dict[str, Any]:
+        job_name, out = self.sandbox.run_shell(args["cmd"])
+        self._audit_allowed(
+            name,
+            args_hash,
+            sandbox_job=job_name,
+            stdout_sha256=sha256_text(out),
+            stdout_preview=out[:200],
+        )
+        return {"tool": name, "ok": True, "stdout": out, "job": job_name}
@@ -0,0 +1,77 @@
+"""Shared Kubernetes API clients.
+
+Every ``client.*Api()`` built without an explicit ApiClient creates its own,
+each with a separate urllib3 connection pool. The helpers below build a single
+ApiClient on first use (after main.py has loaded the cluster config) and hand
+it to every API wrapper, so all controllers share one pool.
+"""
+
+from functools import cache
+import urllib3
+from kubernetes import client
+
+
+# Reconciles run on kopf's handler threads and fan out further on the
+# runtime pool in reconcile.py; size the pool so they do not queue for
+# connections.
+CONNECTION_POOL_MAXSIZE = 32
+
+
+def _configuration() -> client.Configuration:
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = CONNECTION_POOL_MAXSIZE
+    return configuration
+
+
+@cache
+def api_client() -> client.ApiClient:
+    return client.ApiClient(_configuration())
+
+
+@cache
+def core_v1_api() -> client.CoreV1Api:
+    return client.CoreV1Api(api_client())
+
+
+@cache
+def apps_v1_api() -> client.AppsV1Api:
+    return client.AppsV1Api(api_client())
+
+
+@cache
+def custom_objects_api() -> client.CustomObjectsApi:
+    return client.CustomObjectsApi(api_client())
+
+
+# The generated patch_* methods pick a merge-patch content type on their own.
+# Server-side apply needs application/apply-patch+yaml instead, which the
+# client only sends when it is set as a default header, so apply calls go
+# through their own ApiClient.
+APPLY_CONTENT_TYPE = "application/apply-patch+yaml"
+FIELD_MANAGER = "universe-operator"
+
+
+@cache
+def apply_api_client() -> client.ApiClient:
+    return client.ApiClient(
+        _configuration(), header_name="Content-Type", header_value=APPLY_CONTENT_TYPE,
+    )
+
+
+@cache
+def core_v1_apply_api() -> client.CoreV1Api:
+    return client.CoreV1Api(apply_api_client())
+
+
+@cache
+def apps_v1_apply_api() -> client.AppsV1Api:
+    return client.AppsV1Api(apply_api_client())
+
+
+@cache
+def inbox_http() -> urllib3.PoolManager:
+    """Keep-alive pool for task deliveries to agent runtime inbox endpoints."""
+    return urllib3.PoolManager(
+        retries=False,
+        timeout=urllib3.Timeout(connect=1.0, read=2.0),
+    )
@@ -1,5 +1,8 @@
 from kubernetes import client
 
+CONSCIOUSNESS_ID_ENV = "CONSCIOUSNESS_ID"
+CONSCIOUSNESS_NAME_ENV = "CONSCIOUSNESS_NAME"
+
 class BindingController:
     """
     Implements the Binding primitive: attachment of consciousness -> pod.
@@ -24,10 +27,9 @@ class BindingController:
         This represents the 'attachment'.
         """
         container = pod_spec.containers[0]
-        if not container.env:
-            container.env = []
-        
-        container.env.append(client.V1EnvVar(name="CONSCIOUSNESS_ID", value=consciousness.get("id", "default")))
-        container.env.append(client.V1EnvVar(name="CONSCIOUSNESS_NAME", value=consciousness.get("name", "Default")))
-        
-        self.logger.info(f"Bound consciousness {consciousness.get('id')} to pod spec.")
+        container.env = (container.env or []) + [
+            client.V1EnvVar(name=CONSCIOUSNESS_ID_ENV, value=consciousness.get("id", "default")),
+            client.V1EnvVar(name=CONSCIOUSNESS_NAME_ENV, value=consciousness.get("name", "Default")),
+        ]
+
+        self.logger.info("Bound consciousness %s to pod spec.", consciousness.get("id"))
@@ -1,6 +1,7 @@
+import os
 import kopf
 import kubernetes
-from .reconcile import ensure_agent_runtime
+from .reconcile import SPEC_HASH_ANNOTATION, ensure_agent_runtime
 from .task_controller import TaskController
 from .team_controller import TeamController
 from .message_controller import MessageController
@@ -8,31 +9,84 @@ from .metric_controller import MetricController
 
 kubernetes.config.load_incluster_config()
 
+TERMINAL_TASK_PHASES = frozenset(("Completed", "Failed", "Cancelled"))
+
 @kopf.on.startup()
 def _startup(settings: kopf.OperatorSettings, **_):
     settings.posting.level = "INFO"
+    # Collapse bursts of watch events for the same object (spec edits followed
+    # by status writes) into one handler run on the latest version.
+    settings.batching.batch_window = 0.2
+
+# In-memory views of the watched resources, kept current by kopf and passed
+# to handlers by name so controllers can avoid per-event API reads.
+# kopf matches labels= on its side, so the pod, configmap and deployment
+# indexes receive every such object in the watched namespaces. The operator
+# is therefore scoped to WATCH_NAMESPACE (see the bottom of this module),
+# which bounds that stream to the namespace the agents run in.
+@kopf.index('universe.ai', 'v1alpha1', 'agents')
+def agent_index(namespace, name, spec, status, **_):
+    return {(namespace, name): {
+        "tools": frozenset(spec.get("tools", {}).get("allow", [])),
+        "zone": spec.get("zone"),
+        "phase": status.get("phase", ""),
+    }}
+
+@kopf.index('universe.ai', 'v1alpha1', 'agents')
+def agent_tool_index(namespace, name, spec, **_):
+    return {(namespace, tool): name for tool in spec.get("tools", {}).get("allow", [])}
+
+@kopf.index('', 'v1', 'pods', labels={'app': 'universe-agent'})
+def agent_pod_index(namespace, name, labels, status, **_):
+    return {(namespace, labels.get("agent")): (name, status.get("phase"), status.get("podIP"))}
+
+@kopf.index('', 'v1', 'configmaps', labels={'app': 'universe-agent'})
+def runtime_config_index(namespace, labels, annotations, **_):
+    return {(namespace, labels.get("agent")): annotations.get(SPEC_HASH_ANNOTATION)}
+
+@kopf.index('apps', 'v1', 'deployments', labels={'app': 'universe-agent'})
+def runtime_deployment_index(namespace, labels, annotations, **_):
+    return {(namespace, labels.get("agent")): annotations.get(SPEC_HASH_ANNOTATION)}
+
+@kopf.index('universe.ai', 'v1alpha1', 'tasks')
+def task_index(namespace, name, status, **_):
+    return {(namespace, name): status.get("phase")}
+
+@kopf.index('universe.ai', 'v1alpha1', 'teams')
+def team_index(namespace, name, spec, **_):
+    return {(namespace, name): list(spec.get("members", []))}
 
 @kopf.on.create('universe.ai', 'v1alpha1', 'agents')
 @kopf.on.update('universe.ai', 'v1alpha1', 'agents')
-def agent_reconcile(spec, name, namespace, logger, **_):
-    logger.info(f"Reconciling Agent {namespace}/{name}")
-    ensure_agent_runtime(agent_name=name, namespace=namespace, agent_spec=spec, logger=logger)
+def agent_reconcile(spec, name, namespace, logger,
+                    runtime_config_index, runtime_deployment_index, **_):
+    logger.info("Reconciling Agent %s/%s", namespace, name)
+    # Label/annotation-only updates are skipped inside ensure_agent_runtime:
+    # the indexes show the live objects already carry the spec's hash.
+    ensure_agent_runtime(agent_name=name, namespace=namespace, agent_spec=dict(spec), logger=logger,
+                         config_index=runtime_config_index,
+                         deployment_index=runtime_deployment_index)
 
-@kopf.on.create('universe.ai', 'v1alpha1', 'tasks')
-@kopf.on.update('universe.ai', 'v1alpha1', 'tasks')
-def task_reconcile(spec, name, namespace, status, logger, **_):
-    logger.info(f"Reconciling Task {namespace}/{name}")
-    controller = TaskController(namespace, logger)
+def _task_is_active(status, **_):
+    return status.get("phase", "Pending") not in TERMINAL_TASK_PHASES
 
-    phase = status.get("phase", "Pending")
-    if phase in ["Completed", "Failed", "Cancelled"]:
-        logger.debug(f"Task {name} already in terminal state: {phase}")
-        return
+# Terminal tasks are filtered out by kopf before the handler is invoked.
+@kopf.on.create('universe.ai', 'v1alpha1', 'tasks', when=_task_is_active)
+@kopf.on.update('universe.ai', 'v1alpha1', 'tasks', when=_task_is_active)
+def task_reconcile(spec, name, namespace, status, logger,
+                   task_index, agent_index, agent_tool_index, agent_pod_index, **_):
+    logger.info("Reconciling Task %s/%s", namespace, name)
 
+    phase = status.get("phase", "Pending")
+    controller = TaskController(
+        namespace, logger,
+        task_index=task_index, agent_index=agent_index, pod_index=agent_pod_index,
+        tool_index=agent_tool_index,
+    )
     dependencies = spec.get("dependencies", [])
     if dependencies:
         if not controller.check_dependencies(name, dependencies):
-            logger.info(f"Task {name} waiting for dependencies")
+            logger.info("Task %s waiting for dependencies", name)
             return
 
     if phase == "Pending":
@@ -40,24 +94,31 @@ def task_reconcile(spec, name, namespace, status, logger, **_):
 
 @kopf.on.create('universe.ai', 'v1alpha1', 'teams')
 @kopf.on.update('universe.ai', 'v1alpha1', 'teams')
-def team_reconcile(spec, name, namespace, logger, **_):
-    logger.info(f"Reconciling Team {namespace}/{name}")
-    controller = TeamController(namespace, logger)
+def team_reconcile(spec, name, namespace, logger, agent_index, **_):
+    logger.info("Reconciling Team %s/%s", namespace, name)
+    controller = TeamController(namespace, logger, agent_index=agent_index)
     status = controller.reconcile_team(name, spec)
     return {"status": status}
 
 @kopf.on.create('universe.ai', 'v1alpha1', 'messages')
-def message_reconcile(spec, name, namespace, logger, **_):
-    logger.info(f"Processing Message {namespace}/{name}")
-    controller = MessageController(namespace, logger)
+def message_reconcile(spec, name, namespace, logger, agent_index, team_index, **_):
+    logger.info("Processing Message %s/%s", namespace, name)
+    controller = MessageController(namespace, logger, agent_index=agent_index, team_index=team_index)
     status = controller.process_message(name, spec)
     return {"status": status}
 
 @kopf.on.create('universe.ai', 'v1alpha1', 'metrics')
 @kopf.on.update('universe.ai', 'v1alpha1', 'metrics')
 def metric_reconcile(spec, name, namespace, logger, **_):
-    logger.info(f"Processing Metric {namespace}/{name}")
+    logger.info("Processing Metric %s/%s", namespace, name)
     controller = MetricController(namespace, logger)
     status = controller.process_metric(name, spec)
     if status:
         return {"status": status}
+
+if __name__ == "__main__":
+    watch_namespace = os.getenv("WATCH_NAMESPACE")
+    if watch_namespace:
+        kopf.run(namespaces=[watch_namespace])
+    else:
+        kopf.run(clusterwide=True)
@@ -1,13 +1,22 @@
 import kopf
 from kubernetes import client
-from datetime import datetime
+from datetime import datetime, timezone
+
+from .clients import custom_objects_api
 
 
 class MessageController:
-    def __init__(self, namespace: str, logger):
+    def __init__(self, namespace: str, logger, agent_index=None, team_index=None):
+        """
+        agent_index and team_index are the kopf indexes built in main.py.
+        When given, agent and team lookups are served from them instead of
+        the API server.
+        """
         self.namespace = namespace
         self.logger = logger
-        self.api = client.CustomObjectsApi()
+        self.api = custom_objects_api()
+        self.agent_index = agent_index
+        self.team_index = team_index
 
     def process_message(self, message_name: str, spec: dict) -> dict:
         """
@@ -40,23 +49,25 @@ class MessageController:
                 self.logger.warning(f"Message {message_name}: Recipient agent {to_agent} does not exist")
                 return status
 
+            self.logger.info(f"Delivering message {message_name} to agent {to_agent}")
             delivered = self._deliver_to_agent(to_agent, message_name, spec)
-            if delivered:
-                status["delivered"] = True
-                status["deliveredAt"] = datetime.utcnow().isoformat() + "Z"
 
         elif channel:
             delivered = self._deliver_to_channel(channel, message_name, spec)
-            if delivered:
-                status["delivered"] = True
-                status["deliveredAt"] = datetime.utcnow().isoformat() + "Z"
         else:
             self.logger.warning(f"Message {message_name}: No recipient (to/channel) specified")
+            delivered = False
+
+        if delivered:
+            status["delivered"] = True
+            status["deliveredAt"] = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
         return status
 
     def _agent_exists(self, agent_name: str) -> bool:
         """Check if agent exists in namespace."""
+        if self.agent_index is not None:
+            return (self.namespace, agent_name) in self.agent_index
         try:
             self.api.get_namespaced_custom_object(
                 group="universe.ai",
@@ -78,17 +89,7 @@ class MessageController:
         In production, this would write to agent's workspace PVC or message queue.
         For now, just log the delivery.
         """
-        self.logger.info(f"Delivering message {message_name} to agent {agent_name}")
-
         try:
-            agent = self.api.get_namespaced_custom_object(
-                group="universe.ai",
-                version="v1alpha1",
-                namespace=self.namespace,
-                plural="agents",
-                name=agent_name
-            )
-
             self.logger.debug(
                 f"Message delivery: from={spec.get('from')} "
                 f"to={agent_name} priority={spec.get('priority', 'normal')} "
@@ -109,33 +110,46 @@ class MessageController:
         self.logger.info(f"Broadcasting message {message_name} to channel {channel}")
 
         try:
-            teams = self.api.list_namespaced_custom_object(
-                group="universe.ai",
-                version="v1alpha1",
-                namespace=self.namespace,
-                plural="teams"
-            )
-
-            target_team = None
-            for team in teams.get("items", []):
-                if team.get("metadata", {}).get("name") == channel:
-                    target_team = team
-                    break
-
-            if not target_team:
+            members = self._team_members(channel)
+            if members is None:
                 self.logger.warning(f"Channel/team {channel} not found")
                 return False
 
-            members = target_team.get("spec", {}).get("members", [])
-            delivered_count = 0
-
+            recipients, missing = [], []
             for member in members:
-                if self._deliver_to_agent(member, message_name, spec):
-                    delivered_count += 1
+                (recipients if self._agent_exists(member) else missing).append(member)
+
+            delivered_count = sum(
+                1 for m in recipients if self._deliver_to_agent(m, message_name, spec)
+            )
 
-            self.logger.info(f"Broadcast to {channel}: delivered to {delivered_count}/{len(members)} members")
+            self.logger.info(
+                f"Broadcast to {channel}: delivered to {delivered_count}/{len(members)} members"
+                + (f" (missing agents: {', '.join(missing)})" if missing else "")
+            )
             return delivered_count > 0
 
         except Exception as e:
             self.logger.error(f"Failed to broadcast to channel {channel}: {e}")
             return False
+
+    def _team_members(self, team_name: str):
+        """Return the team's member list, or None if the team does not exist."""
+        if self.team_index is not None:
+            for members in self.team_index.get((self.namespace, team_name), []):
+                return members
+            return None
+
+        try:
+            team = self.api.get_namespaced_custom_object(
+                group="universe.ai",
+                version="v1alpha1",
+                namespace=self.namespace,
+                plural="teams",
+                name=team_name
+            )
+        except client.exceptions.ApiException as e:
+            if e.status == 404:
+                return None
+            raise
+        return team.get("spec", {}).get("members", [])
@@ -2,12 +2,25 @@ import kopf
 from kubernetes import client
 import re
 
+from .clients import custom_objects_api
+
+# YYYY-QN (e.g., 2024-Q1) or YYYY-MM (e.g., 2024-01)
+_PERIOD_RE = re.compile(r'^\d{4}-(?:Q[1-4]|0[1-9]|1[0-2])$')
+
+# (field, predicate the value must satisfy, warning when it does not)
+_METRIC_CHECKS = (
+    ("tasksCompleted", lambda v: v >= 0, "cannot be negative"),
+    ("tasksFailed", lambda v: v >= 0, "cannot be negative"),
+    ("errorRate", lambda v: 0.0 <= v <= 1.0, "must be between 0.0 and 1.0"),
+    ("auditScore", lambda v: 0.0 <= v <= 1.0, "must be between 0.0 and 1.0"),
+)
+
 
 class MetricController:
     def __init__(self, namespace: str, logger):
         self.namespace = namespace
         self.logger = logger
-        self.api = client.CustomObjectsApi()
+        self.api = custom_objects_api()
 
     def process_metric(self, metric_name: str, spec: dict) -> dict:
         """
@@ -62,42 +75,33 @@ class MetricController:
         - YYYY-QN (e.g., 2024-Q1)
         - YYYY-MM (e.g., 2024-01)
         """
-        quarterly_pattern = r'^\d{4}-Q[1-4]$'
-        monthly_pattern = r'^\d{4}-(0[1-9]|1[0-2])$'
-
-        return bool(re.match(quarterly_pattern, period) or re.match(monthly_pattern, period))
+        return _PERIOD_RE.match(period) is not None
 
     def _validate_metrics(self, metric_name: str, metrics: dict):
         """Validate metric values."""
         tasks_completed = metrics.get("tasksCompleted")
         tasks_failed = metrics.get("tasksFailed")
         error_rate = metrics.get("errorRate")
-        audit_score = metrics.get("auditScore")
 
-        if tasks_completed is not None and tasks_completed < 0:
-            self.logger.warning(f"Metric {metric_name}: tasksCompleted cannot be negative")
+        violations = [
+            f"{field} {message}"
+            for field, in_range, message in _METRIC_CHECKS
+            if metrics.get(field) is not None and not in_range(metrics[field])
+        ]
 
-        if tasks_failed is not None and tasks_failed < 0:
-            self.logger.warning(f"Metric {metric_name}: tasksFailed cannot be negative")
-
-        if error_rate is not None:
-            if not (0.0 <= error_rate <= 1.0):
-                self.logger.warning(f"Metric {metric_name}: errorRate must be between 0.0 and 1.0")
-
-        if audit_score is not None:
-            if not (0.0 <= audit_score <= 1.0):
-                self.logger.warning(f"Metric {metric_name}: auditScore must be between 0.0 and 1.0")
-
-        if tasks_completed is not None and tasks_failed is not None:
+        if tasks_completed is not None and tasks_failed is not None and error_rate is not None:
             total = tasks_completed + tasks_failed
-            if total > 0 and error_rate is not None:
+            if total > 0:
                 calculated_error_rate = tasks_failed / total
                 if abs(calculated_error_rate - error_rate) > 0.01:
-                    self.logger.warning(
-                        f"Metric {metric_name}: errorRate mismatch "
+                    violations.append(
+                        f"errorRate mismatch "
                         f"(specified: {error_rate}, calculated: {calculated_error_rate:.3f})"
                     )
 
+        if violations:
+            self.logger.warning(f"Metric {metric_name}: {'; '.join(violations)}")
+
     def _calculate_aggregates(self, metric_name: str, agent_name: str, period: str, metrics: dict):
         """
         Calculate aggregate metrics for team/zone.
@@ -1,14 +1,69 @@
 
+from hashlib import sha256
 import json
+import logging
+import secrets
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timezone
+import orjson
 from kubernetes import client
 
+from .clients import (
+    FIELD_MANAGER, api_client, apps_v1_apply_api, core_v1_api, core_v1_apply_api,
+    custom_objects_api,
+)
 from .controllers.binding import BindingController
+from .retry import retry_on_conflict
+
+_logger = logging.getLogger(__name__)
+
+# Port of the runtime's HTTP inbox endpoint (see universe_agent/inbox_server.py).
+RUNTIME_INBOX_PORT = 8081
+
+# Each agent gets a Secret holding a random token. The runtime reads it from
+# INBOX_TOKEN and rejects inbox posts that do not carry it, so reaching the
+# pod IP is not enough to inject tasks.
+INBOX_TOKEN_KEY = "token"
+
+def inbox_token_secret_name(agent_name: str) -> str:
+    return f"{agent_name}-inbox-token"
+
+# Hardened container security context shared by every agent runtime.
+# The kubernetes client only serializes it, so it must not be mutated.
+RUNTIME_SECURITY_CONTEXT = client.V1SecurityContext(
+    run_as_non_root=True,
+    read_only_root_filesystem=True,
+    allow_privilege_escalation=False,
+    capabilities=client.V1Capabilities(drop=["ALL"]),
+)
+
+# Shared by all reconciles so the independent per-agent API writes and the
+# cosign check can overlap without paying thread start-up each time.
+_runtime_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent-runtime")
+
+# The ConfigMap and Deployment record the spec they were applied from in this
+# annotation. Bump RUNTIME_TEMPLATE_REVISION whenever the objects generated
+# below change shape, so existing agents are re-applied on their next event.
+SPEC_HASH_ANNOTATION = "universe.ai/spec-hash"
+RUNTIME_TEMPLATE_REVISION = 2
+
+def spec_hash(agent_spec: dict) -> str:
+    """Stable content hash of an Agent spec, used to detect no-op updates."""
+    raw = json.dumps(agent_spec, sort_keys=True, separators=(",", ":"))
+    return sha256(raw.encode("utf-8")).hexdigest()
+
+def _indexed_hash(index, key):
+    if index is None:
+        return None
+    for applied in index.get(key, []):
+        return applied
+    return None
 
 def update_agent_status(namespace, agent_name, condition, logger):
     """Updates the status of an Agent custom resource."""
-    custom_api = client.CustomObjectsApi()
+    custom_api = custom_objects_api()
     
     # Ensure lastTransitionTime is set
     if "lastTransitionTime" not in condition:
@@ -21,103 +76,102 @@ def update_agent_status(namespace, agent_name, condition, logger):
     }
     
     try:
-        custom_api.patch_namespaced_custom_object_status(
+        retry_on_conflict(lambda: custom_api.patch_namespaced_custom_object_status(
             group="universe.ai",
             version="v1alpha1",
             name=agent_name,
             namespace=namespace,
             plural="agents",
             body=status_patch,
-        )
-        logger.info(f"Patched status for Agent {namespace}/{agent_name} with condition {condition['type']}: {condition['status']}")
+        ))
+        logger.info("Patched status for Agent %s/%s with condition %s: %s", namespace, agent_name, condition["type"], condition["status"])
     except client.exceptions.ApiException as e:
-        logger.error(f"Failed to patch agent status for {namespace}/{agent_name}: {e}")
+        logger.error("Failed to patch agent status for %s/%s: %s", namespace, agent_name, e)
+
+def _image_repository(image_uri):
+    """Strips the tag or digest from an image reference."""
+    repo = image_uri.split("@", 1)[0]
+    name, sep, tag = repo.rpartition(":")
+    return name if sep and "/" not in tag else repo
+
+def _verified_digest(cosign_stdout):
+    """Manifest digest cosign verified, or None if it is missing or ambiguous.
+
+    cosign prints the verified signature payloads as JSON on stdout; each one
+    names the digest it covers under critical.image.docker-manifest-digest.
+    """
+    try:
+        payloads = json.loads(cosign_stdout)
+    except ValueError:
+        return None
+    if isinstance(payloads, dict):
+        payloads = [payloads]
+    if not isinstance(payloads, list):
+        return None
+    digests = {
+        p.get("critical", {}).get("image", {}).get("docker-manifest-digest")
+        for p in payloads if isinstance(p, dict)
+    }
+    if len(digests) != 1:
+        return None
+    digest = digests.pop()
+    return digest if isinstance(digest, str) and digest.startswith("sha256:") else None
 
 def verify_image_signature(image_uri, logger):
-    """Verifies the image signature using cosign."""
+    """Verifies the image signature using cosign.
+
+    Returns (is_verified, reason, message, pinned_image), where pinned_image is
+    the verified image as repo@digest so the Deployment pulls exactly what
+    cosign checked, even if the tag moves afterwards.
+    """
     # In a real-world scenario, the public key should be managed securely,
     # for example, via a ConfigMap mounted into the operator.
     cosign_pub_key = "/etc/cosign/cosign.pub"
+
     command = ["cosign", "verify", "--key", cosign_pub_key, image_uri]
     
-    logger.info(f"Running image verification: {' '.join(command)}")
+    logger.info("Running image verification: %s", " ".join(command))
     try:
         # The COSIGN_EXPERIMENTAL=1 env var might be needed for keyless, but we use a key.
         result = subprocess.run(command, capture_output=True, text=True, check=True, env={"COSIGN_EXPERIMENTAL": "1"})
-        logger.info(f"Image {image_uri} verified successfully.")
-        logger.debug(f"Cosign output: {result.stderr}")
-        return True, "VerificationSucceeded", "Image signature is valid and trusted."
     except FileNotFoundError:
         logger.error("`cosign` binary not found. Please ensure it is installed in the operator's container.")
-        return False, "VerificationFailed", "`cosign` binary not found in operator container."
+        return False, "VerificationFailed", "`cosign` binary not found in operator container.", None
     except subprocess.CalledProcessError as e:
         error_message = e.stderr.strip().split('\n')[-1] # Get the most relevant error line
-        logger.error(f"Image verification failed for {image_uri}: {error_message}")
-        return False, "VerificationFailed", error_message
+        logger.error("Image verification failed for %s: %s", image_uri, error_message)
+        return False, "VerificationFailed", error_message, None
 
-def ensure_agent_runtime(agent_name: str, namespace: str, agent_spec: dict, logger):
-    core = client.CoreV1Api()
-    apps = client.AppsV1Api()
-    
-    binding_ctrl = BindingController(logger)
-    consciousness = binding_ctrl.resolve_consciousness(agent_spec)
+    logger.debug("Cosign output: %s", result.stderr)
+    digest = _verified_digest(result.stdout)
+    if digest is None:
+        logger.error("Could not read the verified digest of %s from cosign output.", image_uri)
+        return False, "VerificationFailed", "cosign did not report a single verified image digest.", None
 
-    # --- Image Verification Logic ---
-    image_spec = agent_spec.get("image", {})
-    should_verify = image_spec.get("verify", False)
-    image_repo = image_spec.get("repository", "rynxs/universal-agent-runtime")
-    image_tag = image_spec.get("tag", "latest")
-    image = f"{image_repo}:{image_tag}"
+    pinned_image = f"{_image_repository(image_uri)}@{digest}"
+    logger.info("Image %s verified successfully as %s.", image_uri, pinned_image)
+    return True, "VerificationSucceeded", "Image signature is valid and trusted.", pinned_image
 
-    if should_verify:
-        logger.info(f"Image signature verification is enabled for {image}")
-        is_verified, reason, message = verify_image_signature(image, logger)
-        
-        condition = {
-            "type": "ImageVerified",
-            "status": "True" if is_verified else "False",
-            "reason": reason,
-            "message": message,
-        }
-        update_agent_status(namespace, agent_name, condition, logger)
-
-        if not is_verified:
-            logger.error(f"Halting reconciliation for agent {agent_name} due to image verification failure.")
-            return  # Stop processing
+@lru_cache(maxsize=4096)
+def _deployment_body(agent_name, namespace, image, consciousness_id, consciousness_name, runtime_hash):
+    """Serialized runtime Deployment for an agent.
 
-    # --- ConfigMap for Agent Spec ---
+    Everything in it is derived from the arguments, and runtime_hash pins the
+    spec, so repeat reconciles of the same spec reuse the body instead of
+    rebuilding the model tree. The returned dict is shared: do not mutate it.
+    """
     cm_name = f"{agent_name}-spec"
-    cm = client.V1ConfigMap(
-        metadata=client.V1ObjectMeta(name=cm_name, namespace=namespace),
-        data={"agent.json": json.dumps(agent_spec, indent=2)},
-    )
-    try:
-        core.create_namespaced_config_map(namespace, cm)
-        logger.info(f"Created ConfigMap {cm_name}")
-    except client.exceptions.ApiException as e:
-        if e.status != 409: raise
-        core.patch_namespaced_config_map(cm_name, namespace, cm)
-
-    # --- PVC for Workspace ---
     pvc_name = f"{agent_name}-workspace"
-    size = agent_spec.get("workspace", {}).get("size", "1Gi")
-    pvc = client.V1PersistentVolumeClaim(
-        metadata=client.V1ObjectMeta(name=pvc_name, namespace=namespace),
-        spec=client.V1PersistentVolumeClaimSpec(
-            access_modes=["ReadWriteOnce"],
-            resources=client.V1ResourceRequirements(requests={"storage": size})
-        )
-    )
-    try:
-        core.create_namespaced_persistent_volume_claim(namespace, pvc)
-        logger.info(f"Created PVC {pvc_name}")
-    except client.exceptions.ApiException as e:
-        if e.status != 409: raise
-
-    # --- Deployment for Agent Runtime ---
+    runtime_labels = {"app": "universe-agent", "agent": agent_name}
+    runtime_annotations = {SPEC_HASH_ANNOTATION: runtime_hash}
     dep_name = f"{agent_name}-runtime"
     dep = client.V1Deployment(
-        metadata=client.V1ObjectMeta(name=dep_name, namespace=namespace, labels={"app": "universe-agent", "agent": agent_name}),
+        api_version="apps/v1",
+        kind="Deployment",
+        metadata=client.V1ObjectMeta(
+            name=dep_name, namespace=namespace,
+            labels=runtime_labels, annotations=runtime_annotations,
+        ),
         spec=client.V1DeploymentSpec(
             replicas=1,
             selector=client.V1LabelSelector(match_labels={"app": "universe-agent", "agent": agent_name}),
@@ -132,17 +186,21 @@ def ensure_agent_runtime(agent_name: str, namespace: str, agent_spec: dict, logg
                             env=[
                                 client.V1EnvVar(name="AGENT_NAME", value=agent_name),
                                 client.V1EnvVar(name="AGENT_NAMESPACE", value=namespace),
+                                client.V1EnvVar(
+                                    name="INBOX_TOKEN",
+                                    value_from=client.V1EnvVarSource(
+                                        secret_key_ref=client.V1SecretKeySelector(
+                                            name=inbox_token_secret_name(agent_name), key=INBOX_TOKEN_KEY,
+                                        ),
+                                    ),
+                                ),
                             ],
                             volume_mounts=[
                                 client.V1VolumeMount(name="workspace", mount_path="/workspace"),
                                 client.V1VolumeMount(name="agent-spec", mount_path="/config", read_only=True),
                             ],
-                            security_context=client.V1SecurityContext(
-                                run_as_non_root=True,
-                                read_only_root_filesystem=True,
-                                allow_privilege_escalation=False,
-                                capabilities=client.V1Capabilities(drop=["ALL"]),
-                            ),
+                            ports=[client.V1ContainerPort(name="inbox", container_port=RUNTIME_INBOX_PORT)],
+                            security_context=RUNTIME_SECURITY_CONTEXT,
                         )
                     ],
                     volumes=[
@@ -154,11 +212,146 @@ def ensure_agent_runtime(agent_name: str, namespace: str, agent_spec: dict, logg
         )
     )
 
-    binding_ctrl.apply_binding_to_spec(dep.spec.template.spec, consciousness)
+    BindingController(_logger).apply_binding_to_spec(
+        dep.spec.template.spec, {"id": consciousness_id, "name": consciousness_name},
+    )
+    return api_client().sanitize_for_serialization(dep)
+
+def _apply_config_map(core_apply, namespace, cm, logger):
+    core_apply.patch_namespaced_config_map(
+        cm.metadata.name, namespace, cm, field_manager=FIELD_MANAGER, force=True,
+    )
+    logger.info("Applied ConfigMap %s", cm.metadata.name)
+
+def _create_pvc(core, namespace, pvc, logger):
+    try:
+        core.create_namespaced_persistent_volume_claim(namespace, pvc)
+        logger.info("Created PVC %s", pvc.metadata.name)
+    except client.exceptions.ApiException as e:
+        if e.status != 409: raise
 
+def _create_inbox_token(core, namespace, agent_name, labels, logger):
+    # Create-only: the running pod already holds the existing token.
+    secret = client.V1Secret(
+        metadata=client.V1ObjectMeta(
+            name=inbox_token_secret_name(agent_name), namespace=namespace, labels=labels,
+        ),
+        string_data={INBOX_TOKEN_KEY: secrets.token_urlsafe(32)},
+    )
     try:
-        apps.create_namespaced_deployment(namespace, dep)
-        logger.info(f"Created Deployment {dep_name}")
+        core.create_namespaced_secret(namespace, secret)
+        logger.info("Created Secret %s", secret.metadata.name)
     except client.exceptions.ApiException as e:
         if e.status != 409: raise
-        apps.patch_namespaced_deployment(dep_name, namespace, dep)
+
+def ensure_agent_runtime(agent_name: str, namespace: str, agent_spec: dict, logger,
+                         config_index=None, deployment_index=None) -> bool:
+    """Creates or updates the ConfigMap, PVC and Deployment backing an Agent.
+
+    config_index and deployment_index map (namespace, agent name) to the
+    spec-hash annotation on the agent's live ConfigMap and Deployment. When
+    both already carry the current hash, nothing is written.
+
+    Returns False when reconciliation was halted by a failed image verification.
+    """
+    runtime_hash = f"{RUNTIME_TEMPLATE_REVISION}-{spec_hash(agent_spec)}"
+    key = (namespace, agent_name)
+    if (_indexed_hash(config_index, key) == runtime_hash
+            and _indexed_hash(deployment_index, key) == runtime_hash):
+        logger.debug("Runtime objects for agent %s already match its spec.", agent_name)
+        return True
+    runtime_labels = {"app": "universe-agent", "agent": agent_name}
+    runtime_annotations = {SPEC_HASH_ANNOTATION: runtime_hash}
+
+    core = core_v1_api()
+    # ConfigMap and Deployment are server-side applied: one request whether
+    # or not they already exist. The PVC is create-only, as its spec is
+    # largely immutable once bound.
+    core_apply = core_v1_apply_api()
+    apps_apply = apps_v1_apply_api()
+    
+    consciousness = BindingController(logger).resolve_consciousness(agent_spec)
+
+    # --- Image Verification Logic ---
+    image_spec = agent_spec.get("image", {})
+    should_verify = image_spec.get("verify", False)
+    image_repo = image_spec.get("repository", "rynxs/universal-agent-runtime")
+    image_tag = image_spec.get("tag", "latest")
+    image = f"{image_repo}:{image_tag}"
+
+    # Cosign runs alongside the PVC and token writes, which running pods do
+    # not see. The ConfigMap is mounted by the current pods and the Deployment
+    # pulls the image, so both wait for its verdict.
+    verification = None
+    if should_verify:
+        logger.info("Image signature verification is enabled for %s", image)
+        verification = _runtime_pool.submit(verify_image_signature, image, logger)
+
+    # --- ConfigMap for Agent Spec ---
+    cm_name = f"{agent_name}-spec"
+    cm = client.V1ConfigMap(
+        api_version="v1",
+        kind="ConfigMap",
+        metadata=client.V1ObjectMeta(
+            name=cm_name, namespace=namespace,
+            labels=runtime_labels, annotations=runtime_annotations,
+        ),
+        data={"agent.json": orjson.dumps(agent_spec, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode()},
+    )
+
+    # --- PVC for Workspace ---
+    pvc_name = f"{agent_name}-workspace"
+    size = agent_spec.get("workspace", {}).get("size", "1Gi")
+    pvc = client.V1PersistentVolumeClaim(
+        metadata=client.V1ObjectMeta(name=pvc_name, namespace=namespace),
+        spec=client.V1PersistentVolumeClaimSpec(
+            access_modes=["ReadWriteOnce"],
+            resources=client.V1ResourceRequirements(requests={"storage": size})
+        )
+    )
+    pending = [
+        _runtime_pool.submit(_create_pvc, core, namespace, pvc, logger),
+        _runtime_pool.submit(_create_inbox_token, core, namespace, agent_name, runtime_labels, logger),
+    ]
+
+    # --- Deployment for Agent Runtime ---
+    dep_name = f"{agent_name}-runtime"
+
+    verified = True
+    try:
+        if verification is not None:
+            verified, reason, message, pinned_image = verification.result()
+            condition = {
+                "type": "ImageVerified",
+                "status": "True" if verified else "False",
+                "reason": reason,
+                "message": message,
+            }
+            update_agent_status(namespace, agent_name, condition, logger)
+
+            if verified:
+                image = pinned_image  # pull exactly what cosign verified
+            else:
+                logger.error("Halting reconciliation for agent %s due to image verification failure.", agent_name)
+
+        if verified:
+            pending.append(_runtime_pool.submit(_apply_config_map, core_apply, namespace, cm, logger))
+            dep = _deployment_body(
+                agent_name, namespace, image,
+                str(consciousness.get("id", "default")), str(consciousness.get("name", "Default")),
+                runtime_hash,
+            )
+            apps_apply.patch_namespaced_deployment(dep_name, namespace, dep, field_manager=FIELD_MANAGER, force=True)
+            logger.info("Applied Deployment %s", dep_name)
+    finally:
+        # Always wait for the other writes, but do not let their errors
+        # replace one already propagating from above.
+        errors = [e for e in (f.exception() for f in pending) if e is not None]
+        for e in errors:
+            logger.error("Agent runtime write for %s failed: %s", agent_name, e)
+
+    # Reached on success and on a failed verification alike, so write
+    # errors are raised to kopf on both paths.
+    if errors:
+        raise errors[0]
+    return verified
@@ -0,0 +1,28 @@
+"""Retry helper for API writes that can hit conflicts or throttling."""
+
+import random
+import time
+
+from kubernetes import client
+
+RETRYABLE_STATUSES = frozenset((409, 429))
+
+
+def retry_on_conflict(fn, max_attempts: int = 5, base: float = 0.05):
+    """Call fn, retrying on 409 Conflict and 429 Too Many Requests.
+
+    Waits base * 2**attempt plus jitter between attempts, or the server's
+    Retry-After when a 429 carries one. Other errors, and the last failure,
+    are raised to the caller.
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except client.exceptions.ApiException as e:
+            if e.status not in RETRYABLE_STATUSES or attempt == max_attempts - 1:
+                raise
+            delay = base * 2 ** attempt + random.uniform(0, base)
+            retry_after = (e.headers or {}).get("Retry-After")
+            if e.status == 429 and retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            time.sleep(delay)
@@ -1,21 +1,63 @@
 """Task controller for task assignment and execution tracking."""
 
+import base64
 import json
+import os
 import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import kopf
+import urllib3
 from kubernetes import client
+from kubernetes.stream import stream
+
+from .clients import apps_v1_api, core_v1_api, custom_objects_api, inbox_http
+from .reconcile import INBOX_TOKEN_KEY, RUNTIME_INBOX_PORT, inbox_token_secret_name
+from .retry import retry_on_conflict
+
+# "http" posts tasks to the runtime's inbox endpoint and falls back to pod
+# exec if that fails; "exec" always uses pod exec (runtimes without the
+# endpoint).
+INBOX_TRANSPORT = os.getenv("INBOX_TRANSPORT", "http")
+
+# Seconds before kopf retries a delivery whose outcome was unknown. The
+# runtime skips task_ids it has already read, so a repeat is harmless.
+UNCONFIRMED_RETRY_DELAY = 10
+
+# Inbox tokens by (namespace, agent name). A token only changes when its
+# Secret is recreated; a 401 from the runtime drops the cached copy.
+_inbox_tokens: Dict[Tuple[str, str], str] = {}
 
 
 class TaskController:
     """Manages task assignment and lifecycle."""
 
-    def __init__(self, namespace: str, logger):
+    def __init__(self, namespace: str, logger, task_index=None, agent_index=None, pod_index=None,
+                 tool_index=None):
+        """
+        Args:
+            namespace: Namespace the task lives in
+            logger: Handler logger
+            task_index: Optional kopf index of task phases keyed by
+                (namespace, name); when set, dependency checks are served
+                from it instead of the API server
+            agent_index: Optional kopf index of agent tools/zone/phase keyed
+                by (namespace, name), used for agent selection
+            pod_index: Optional kopf index of agent runtime pods as
+                (pod name, phase, pod IP) keyed by (namespace, agent name)
+            tool_index: Optional kopf index of agent names keyed by
+                (namespace, allowed tool); used with agent_index to narrow
+                candidates to agents allowing every required tool
+        """
         self.namespace = namespace
         self.logger = logger
-        self.core_api = client.CoreV1Api()
-        self.custom_api = client.CustomObjectsApi()
-        self.apps_api = client.AppsV1Api()
+        self.task_index = task_index
+        self.agent_index = agent_index
+        self.pod_index = pod_index
+        self.tool_index = tool_index
+        self.core_api = core_v1_api()
+        self.custom_api = custom_objects_api()
+        self.apps_api = apps_v1_api()
 
     def find_available_agent(
         self,
@@ -31,46 +73,77 @@ class TaskController:
         Returns:
             Agent name if found, None otherwise
         """
+        required = set(required_tools)
         try:
-            agents = self.custom_api.list_namespaced_custom_object(
-                group="universe.ai",
-                version="v1alpha1",
-                namespace=self.namespace,
-                plural="agents"
-            )
-
-            for agent in agents.get("items", []):
-                agent_name = agent["metadata"]["name"]
-                spec = agent.get("spec", {})
-
-                allowed_tools = set(spec.get("tools", {}).get("allow", []))
-                if not all(tool in allowed_tools for tool in required_tools):
+            for agent_name, allowed_tools, agent_zone in self._agent_candidates(required):
+                if not required <= allowed_tools:
                     continue
 
-                if zone:
-                    agent_zone = spec.get("zone")
-                    if agent_zone != zone:
-                        continue
+                if zone and agent_zone != zone:
+                    continue
 
-                pod = self._get_agent_pod(agent_name)
-                if pod and pod.status.phase == "Running":
+                if self._get_agent_pod(agent_name):
                     return agent_name
 
             return None
 
         except client.exceptions.ApiException as e:
-            self.logger.error(f"Failed to list agents: {e}")
+            self.logger.error("Failed to list agents: %s", e)
             return None
 
-    def _get_agent_pod(self, agent_name: str) -> Optional[client.V1Pod]:
+    def _agent_candidates(self, required_tools=frozenset()):
+        """Yield (name, allowed tools, zone) for agents in the namespace.
+
+        With the tool index, only agents allowing all of required_tools are
+        yielded; otherwise every agent is, and the caller filters.
+        """
+        if self.agent_index is not None and self.tool_index is not None and required_tools:
+            names = set.intersection(*(
+                set(self.tool_index.get((self.namespace, tool), []))
+                for tool in required_tools
+            ))
+            for agent_name in sorted(names):
+                for agent in self.agent_index.get((self.namespace, agent_name), []):
+                    yield agent_name, agent["tools"], agent["zone"]
+            return
+
+        if self.agent_index is not None:
+            for (namespace, agent_name), store in self.agent_index.items():
+                if namespace != self.namespace:
+                    continue
+                for agent in store:
+                    yield agent_name, agent["tools"], agent["zone"]
+            return
+
+        agents = self.custom_api.list_namespaced_custom_object(
+            group="universe.ai",
+            version="v1alpha1",
+            namespace=self.namespace,
+            plural="agents"
+        )
+        for agent in agents.get("items", []):
+            spec = agent.get("spec", {})
+            yield (
+                agent["metadata"]["name"],
+                set(spec.get("tools", {}).get("allow", [])),
+                spec.get("zone"),
+            )
+
+    def _get_agent_pod(self, agent_name: str) -> Optional[Tuple[str, Optional[str]]]:
         """Get the running pod for an agent.
 
         Args:
             agent_name: Name of the agent
 
         Returns:
-            Pod object if found and running, None otherwise
+            (pod name, pod IP) if found and running, None otherwise
         """
+        if self.pod_index is not None:
+            for pod_name, phase, pod_ip in self.pod_index.get((self.namespace, agent_name), []):
+                if phase == "Running":
+                    return pod_name, pod_ip
+            return None
+
         try:
             pods = self.core_api.list_namespaced_pod(
                 namespace=self.namespace,
@@ -79,12 +152,12 @@ class TaskController:
 
             for pod in pods.items:
                 if pod.status.phase == "Running":
-                    return pod
+                    return pod.metadata.name, pod.status.pod_ip
 
             return None
 
         except client.exceptions.ApiException as e:
-            self.logger.error(f"Failed to get agent pod: {e}")
+            self.logger.error("Failed to get agent pod: %s", e)
             return None
 
     def assign_task(self, task_name: str, spec: Dict) -> bool:
@@ -105,7 +178,7 @@ class TaskController:
             )
 
             if not assignee:
-                self.logger.warning(f"No available agent for task {task_name}")
+                self.logger.warning("No available agent for task %s", task_name)
                 self._update_task_status(
                     task_name,
                     phase="Pending",
@@ -121,7 +194,7 @@ class TaskController:
                 assigned_agent=assignee,
                 start_time=datetime.now(timezone.utc).isoformat()
             )
-            self.logger.info(f"Task {task_name} assigned to {assignee}")
+            self.logger.info("Task %s assigned to %s", task_name, assignee)
             return True
 
         return False
@@ -141,11 +214,16 @@ class TaskController:
 
         Returns:
             True if write successful, False otherwise
+
+        Raises:
+            kopf.TemporaryError: if an HTTP delivery may or may not have
+                reached the runtime
         """
         pod = self._get_agent_pod(agent_name)
         if not pod:
-            self.logger.error(f"Agent {agent_name} pod not running")
+            self.logger.error("Agent %s pod not running", agent_name)
             return False
+        pod_name, pod_ip = pod
 
         inbox_entry = {
             "task_id": task_name,
@@ -156,31 +234,125 @@ class TaskController:
             "input": spec.get("input", {})
         }
 
-        try:
-            exec_command = [
-                "sh",
-                "-c",
-                f"echo '{json.dumps(inbox_entry)}' >> /workspace/inbox.jsonl"
-            ]
+        if INBOX_TRANSPORT == "http" and pod_ip:
+            posted = self._post_to_inbox(agent_name, pod_ip, inbox_entry)
+            if posted:
+                self.logger.debug("Posted task %s to %s inbox", task_name, agent_name)
+                return True
+            if posted is None:
+                # The runtime may already have the entry. Retry the same
+                # transport later instead of appending it again through exec.
+                self._update_task_status(
+                    task_name,
+                    phase="Pending",
+                    error=f"Delivery to agent {agent_name} unconfirmed, retrying"
+                )
+                raise kopf.TemporaryError(
+                    f"Delivery of task {task_name} to {agent_name} inbox is unconfirmed",
+                    delay=UNCONFIRMED_RETRY_DELAY,
+                )
 
-            response = client.stream(
+        # No shell: dd reads exactly the entry from stdin, appends it to the
+        # inbox and exits, so the entry never passes through a command line.
+        payload = json.dumps(inbox_entry) + "\n"
+        exec_command = [
+            "dd",
+            "of=/workspace/inbox.jsonl",
+            "oflag=append",
+            "conv=notrunc",
+            "iflag=fullblock",
+            f"bs={len(payload.encode('utf-8'))}",
+            "count=1",
+            "status=none",
+        ]
+
+        try:
+            response = stream(
                 self.core_api.connect_get_namespaced_pod_exec,
-                pod.metadata.name,
+                pod_name,
                 self.namespace,
                 command=exec_command,
                 stderr=True,
-                stdin=False,
-                stdout=True,
-                tty=False
+                stdin=True,
+                stdout=False,
+                tty=False,
+                _preload_content=False
             )
+            try:
+                response.write_stdin(payload)
+                response.run_forever(timeout=10)
+                # None while the command is still running (timed out).
+                returncode = None if response.is_open() else response.returncode
+                stderr = response.read_stderr()
+            finally:
+                response.close()
+
+            if returncode != 0:
+                self.logger.error("Failed to write to inbox: exit code %s: %s", returncode, stderr)
+                return False
 
-            self.logger.debug(f"Wrote task {task_name} to {agent_name} inbox")
+            self.logger.debug("Wrote task %s to %s inbox", task_name, agent_name)
             return True
 
         except client.exceptions.ApiException as e:
-            self.logger.error(f"Failed to write to inbox: {e}")
+            self.logger.error("Failed to write to inbox: %s", e)
             return False
 
+    def _inbox_token(self, agent_name: str) -> Optional[str]:
+        """Token the agent's runtime expects on inbox posts, or None if unknown."""
+        key = (self.namespace, agent_name)
+        token = _inbox_tokens.get(key)
+        if token is not None:
+            return token
+        try:
+            secret = self.core_api.read_namespaced_secret(inbox_token_secret_name(agent_name), self.namespace)
+        except client.exceptions.ApiException as e:
+            self.logger.debug("No inbox token for agent %s: %s", agent_name, e.reason)
+            return None
+        encoded = (secret.data or {}).get(INBOX_TOKEN_KEY)
+        if not encoded:
+            return None
+        token = base64.b64decode(encoded).decode("utf-8")
+        _inbox_tokens[key] = token
+        return token
+
+    def _post_to_inbox(self, agent_name: str, pod_ip: str, inbox_entry: Dict) -> Optional[bool]:
+        """Deliver an inbox entry through the runtime's HTTP endpoint.
+
+        Args:
+            agent_name: Name of the agent
+            pod_ip: IP of the agent's running pod
+            inbox_entry: Entry to append to the inbox
+
+        Returns:
+            True if the runtime accepted the entry, False if it certainly did
+            not (exec may be tried instead), None if the outcome is unknown
+        """
+        token = self._inbox_token(agent_name)
+        if token is None:
+            return False
+        try:
+            response = inbox_http().request(
+                "POST",
+                f"http://{pod_ip}:{RUNTIME_INBOX_PORT}/inbox",
+                body=json.dumps(inbox_entry).encode("utf-8"),
+                headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+            )
+        except (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError) as e:
+            self.logger.debug("Inbox endpoint at %s unreachable, falling back to exec: %s", pod_ip, e)
+            return False
+        except urllib3.exceptions.HTTPError as e:
+            # The request was sent, so the runtime may have appended it.
+            self.logger.warning("Inbox post to %s failed after connecting: %s", pod_ip, e)
+            return None
+
+        if response.status == 401:
+            _inbox_tokens.pop((self.namespace, agent_name), None)
+        if response.status >= 300:
+            self.logger.warning("Inbox endpoint at %s returned %s, falling back to exec", pod_ip, response.status)
+            return False
+        return True
+
     def _update_task_status(
         self,
         task_name: str,
@@ -218,17 +390,17 @@ class TaskController:
             status_update["status"]["error"] = error
 
         try:
-            self.custom_api.patch_namespaced_custom_object_status(
+            retry_on_conflict(lambda: self.custom_api.patch_namespaced_custom_object_status(
                 group="universe.ai",
                 version="v1alpha1",
                 namespace=self.namespace,
                 plural="tasks",
                 name=task_name,
                 body=status_update
-            )
-            self.logger.info(f"Updated task {task_name} status: {phase}")
+            ))
+            self.logger.info("Updated task %s status: %s", task_name, phase)
         except client.exceptions.ApiException as e:
-            self.logger.error(f"Failed to update task status: {e}")
+            self.logger.error("Failed to update task status: %s", e)
 
     def check_dependencies(self, task_name: str, dependencies: List[str]) -> bool:
         """Check if all task dependencies are completed.
@@ -244,25 +416,50 @@ class TaskController:
             return True
 
         try:
+            phases = self._task_phases(dependencies)
             for dep_name in dependencies:
-                dep_task = self.custom_api.get_namespaced_custom_object(
-                    group="universe.ai",
-                    version="v1alpha1",
-                    namespace=self.namespace,
-                    plural="tasks",
-                    name=dep_name
-                )
-
-                phase = dep_task.get("status", {}).get("phase")
+                phase = phases.get(dep_name)
                 if phase != "Completed":
                     self.logger.debug(
-                        f"Task {task_name} waiting for dependency {dep_name} "
-                        f"(status: {phase})"
+                        "Task %s waiting for dependency %s (status: %s)",
+                        task_name, dep_name, phase
                     )
                     return False
 
             return True
 
         except client.exceptions.ApiException as e:
-            self.logger.error(f"Failed to check dependencies: {e}")
+            self.logger.error("Failed to check dependencies: %s", e)
             return False
+
+    def _task_phases(self, task_names: List[str]) -> Dict[str, Optional[str]]:
+        """Get the status phases of tasks in this namespace.
+
+        Without the task index, this costs a single LIST of the namespace's
+        tasks rather than one GET per task.
+
+        Args:
+            task_names: Names of the tasks
+
+        Returns:
+            Mapping of task name to phase; tasks that do not exist are absent
+        """
+        if self.task_index is not None:
+            return {
+                name: phase
+                for name in task_names
+                for phase in self.task_index.get((self.namespace, name), [])
+            }
+
+        wanted = set(task_names)
+        tasks = self.custom_api.list_namespaced_custom_object(
+            group="universe.ai",
+            version="v1alpha1",
+            namespace=self.namespace,
+            plural="tasks"
+        )
+        return {
+            task["metadata"]["name"]: task.get("status", {}).get("phase")
+            for task in tasks.get("items", [])
+            if task["metadata"]["name"] in wanted
+        }
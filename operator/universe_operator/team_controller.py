@@ -1,13 +1,16 @@
 import kopf
 from kubernetes import client
 
+from .clients import core_v1_api, custom_objects_api
+
 
 class TeamController:
-    def __init__(self, namespace: str, logger):
+    def __init__(self, namespace: str, logger, agent_index=None):
         self.namespace = namespace
         self.logger = logger
-        self.api = client.CustomObjectsApi()
-        self.core_api = client.CoreV1Api()
+        self.agent_index = agent_index
+        self.api = custom_objects_api()
+        self.core_api = core_v1_api()
 
     def reconcile_team(self, team_name: str, spec: dict) -> dict:
         """
@@ -23,22 +26,24 @@ class TeamController:
 
         members = spec.get("members", [])
         lead = spec.get("lead")
+        agent_phases = self._agent_phases()
 
         if lead:
-            if not self._agent_exists(lead):
-                self.logger.warning(f"Team {team_name}: Lead agent {lead} does not exist")
+            if lead not in agent_phases:
+                self.logger.warning("Team %s: Lead agent %s does not exist", team_name, lead)
                 status["phase"] = "Inactive"
 
         valid_members = []
         active_count = 0
 
         for member in members:
-            if self._agent_exists(member):
+            phase = agent_phases.get(member)
+            if phase is not None:
                 valid_members.append(member)
-                if self._is_agent_active(member):
+                if phase == "Running":
                     active_count += 1
             else:
-                self.logger.warning(f"Team {team_name}: Member agent {member} does not exist")
+                self.logger.warning("Team %s: Member agent %s does not exist", team_name, member)
 
         status["memberCount"] = len(valid_members)
         status["activeMembers"] = active_count
@@ -52,36 +57,26 @@ class TeamController:
 
         return status
 
-    def _agent_exists(self, agent_name: str) -> bool:
-        """Check if agent exists in namespace."""
-        try:
-            self.api.get_namespaced_custom_object(
-                group="universe.ai",
-                version="v1alpha1",
-                namespace=self.namespace,
-                plural="agents",
-                name=agent_name
-            )
-            return True
-        except client.exceptions.ApiException as e:
-            if e.status == 404:
-                return False
-            raise
+    def _agent_phases(self) -> dict:
+        """Map each agent in the namespace to its status phase."""
+        if self.agent_index is not None:
+            return {
+                name: agent["phase"]
+                for (namespace, name), store in self.agent_index.items()
+                if namespace == self.namespace
+                for agent in store
+            }
 
-    def _is_agent_active(self, agent_name: str) -> bool:
-        """Check if agent is in Running state."""
-        try:
-            agent = self.api.get_namespaced_custom_object(
-                group="universe.ai",
-                version="v1alpha1",
-                namespace=self.namespace,
-                plural="agents",
-                name=agent_name
-            )
-            phase = agent.get("status", {}).get("phase", "")
-            return phase == "Running"
-        except client.exceptions.ApiException:
-            return False
+        agents = self.api.list_namespaced_custom_object(
+            group="universe.ai",
+            version="v1alpha1",
+            namespace=self.namespace,
+            plural="agents"
+        )
+        return {
+            agent["metadata"]["name"]: agent.get("status", {}).get("phase", "")
+            for agent in agents.get("items", [])
+        }
 
     def _ensure_shared_pvc(self, pvc_name: str, team_name: str):
         """Ensure shared workspace PVC exists."""
@@ -90,10 +85,10 @@ class TeamController:
                 name=pvc_name,
                 namespace=self.namespace
             )
-            self.logger.debug(f"PVC {pvc_name} already exists for team {team_name}")
+            self.logger.debug("PVC %s already exists for team %s", pvc_name, team_name)
         except client.exceptions.ApiException as e:
             if e.status == 404:
-                self.logger.info(f"Creating shared PVC {pvc_name} for team {team_name}")
+                self.logger.info("Creating shared PVC %s for team %s", pvc_name, team_name)
                 pvc = client.V1PersistentVolumeClaim(
                     metadata=client.V1ObjectMeta(
                         name=pvc_name,
@@ -113,6 +108,6 @@ class TeamController:
                         body=pvc
                     )
                 except client.exceptions.ApiException as create_error:
-                    self.logger.error(f"Failed to create PVC {pvc_name}: {create_error}")
+                    self.logger.error("Failed to create PVC %s: %s", pvc_name, create_error)
             else:
                 raise